@@ -1,7 +1,12 @@
-from ortools.sat.python import cp_model
+import contextlib
+import hashlib
+import json
+import os
 
-# Create the model
-model = cp_model.CpModel()
+from google.protobuf import text_format
+import ortools
+from ortools.sat.python import cp_model
+import numpy as np
 
 # Define constants and parameters
 num_courses = 10
@@ -17,117 +22,286 @@ course_equipment_requirements = [0, 1, 2, 0, 1, 3, 2, 1, 0, 3]  # 0: basic, 1: c
 classroom_equipment_types = [0, 1, 2, 3]  # matching equipment types
 classroom_distances = [5, 10, 3, 8, 7, 6, 2, 4, 9, 1]  # distance from main building
 
-# Variables
-assignment = {}
-start_times = {}
-end_times = {}
+# The built model is cached here and reused while neither this script nor the
+# installed OR-Tools version changes
+model_cache_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cp_model_cache.json')
+
+# Classrooms whose equipment matches each course; no other (course, classroom) pair is ever modelled
+feasible_classrooms_for_course = {
+    course: [classroom for classroom in range(num_classrooms)
+             if course_equipment_requirements[course] == classroom_equipment_types[classroom]]
+    for course in range(num_courses)
+}
+
+# Duration of each course for each professor, adjusted by teaching efficiency
+course_professor_durations = np.array(
+    [[int(course_durations[course] / professor_efficiency[professor]) for professor in range(num_professors)]
+     for course in range(num_courses)],
+    dtype=np.int32
+)
+
+
+# Report every improving schedule found during the search, so the best incumbent
+# is visible while the solver is still working
+class SolutionPrinter(cp_model.CpSolverSolutionCallback):
+    def __init__(self):
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self.solution_count = 0
+
+    def on_solution_callback(self):
+        self.solution_count += 1
+        print(f'Solution {self.solution_count}: objective {self.ObjectiveValue():.0f} '
+              f'after {self.WallTime():.2f}s')
+
+
+def build_model():
+    """Build the scheduling model for a single day.
+
+    Returns the model and, for each course, its (professor, classroom, start time,
+    end time) variables. The classroom is a plain int when the course has a single
+    feasible classroom.
+    """
+    for course, classrooms in feasible_classrooms_for_course.items():
+        if not classrooms:
+            raise ValueError(f'Course {course} requires equipment type {course_equipment_requirements[course]}, '
+                             f'which no classroom has')
+
+    # Create the model
+    model = cp_model.CpModel()
+
+    # Variables
+    # Variable names are left empty; CP-SAT only uses them in debugging output
+    # Which professor teaches each course and which classroom hosts it, plus the
+    # resulting duration and classroom distance of the course. A course with a single
+    # feasible classroom gets that classroom and its distance as plain constants
+    professor_of = np.empty(num_courses, dtype=object)
+    classroom_of = np.empty(num_courses, dtype=object)
+    durations = np.empty(num_courses, dtype=object)
+    distances = np.empty(num_courses, dtype=object)
+    start_times = np.empty(num_courses, dtype=object)
+    end_times = np.empty(num_courses, dtype=object)
 
-for day in range(num_days):
     for course in range(num_courses):
-        for professor in range(num_professors):
-            for classroom in range(num_classrooms):
-                assignment[(day, course, professor, classroom)] = model.NewBoolVar(
-                    f'assignment_d{day}_c{course}_p{professor}_r{classroom}'
-                )
-        start_times[(day, course)] = model.NewIntVar(0, 1440, f'start_time_d{day}_c{course}')
-        end_times[(day, course)] = model.NewIntVar(0, 1440, f'end_time_d{day}_c{course}')
-
-# Constraints
-
-# Each course must be assigned to one professor and one classroom on a given day
-for day in range(num_days):
+        min_duration = int(course_professor_durations[course].min())
+        max_duration = int(course_professor_durations[course].max())
+
+        professor_of[course] = model.NewIntVar(0, num_professors - 1, '')
+        durations[course] = model.NewIntVar(min_duration, max_duration, '')
+        feasible_classrooms = feasible_classrooms_for_course[course]
+        if len(feasible_classrooms) == 1:
+            classroom_of[course] = feasible_classrooms[0]
+            distances[course] = classroom_distances[feasible_classrooms[0]]
+        else:
+            # The domains only allow equipment-compatible classrooms and their distances
+            classroom_of[course] = model.NewIntVarFromDomain(cp_model.Domain.FromValues(feasible_classrooms), '')
+            distances[course] = model.NewIntVarFromDomain(
+                cp_model.Domain.FromValues([classroom_distances[classroom] for classroom in feasible_classrooms]), '')
+        start_times[course] = model.NewIntVar(0, 1440 - min_duration, '')
+        end_times[course] = model.NewIntVar(min_duration, 1440, '')
+
+    # Constraints
+
+    # The course duration depends on the assigned professor and its distance on the classroom
     for course in range(num_courses):
-        model.Add(sum(assignment[(day, course, professor, classroom)]
-                      for professor in range(num_professors)
-                      for classroom in range(num_classrooms)) == 1)
-
-# Each classroom can only handle one course at a time per day
-# for day in range(num_days):
-#     for classroom in range(num_classrooms):
-#         for time_slot in range(1440):  # Time slots in a day (in minutes)
-#             model.Add(
-#                 sum(assignment[(day, course, professor, classroom)]
-#                     for course in range(num_courses)
-#                     for professor in range(num_professors)
-#                     if time_slot >= start_times[(day, course)] and time_slot < end_times[(day, course)]) <= 1
-#             )
-
-for day in range(num_days):
+        model.AddElement(professor_of[course], course_professor_durations[course].tolist(), durations[course])
+        if len(feasible_classrooms_for_course[course]) > 1:
+            model.AddElement(classroom_of[course], classroom_distances[:num_classrooms], distances[course])
+
+    # Each compatible (course, classroom) pair gets an optional interval that is only
+    # present when the course is held in that classroom; the interval ties
+    # end_times == start_times + durations. A course with a single feasible
+    # classroom always uses it, so its interval is mandatory
+    in_classroom = np.empty((num_courses, num_classrooms), dtype=object)
+    intervals = np.empty((num_courses, num_classrooms), dtype=object)
+    for course, feasible_classrooms in feasible_classrooms_for_course.items():
+        if len(feasible_classrooms) == 1:
+            classroom = feasible_classrooms[0]
+            intervals[course, classroom] = model.NewIntervalVar(
+                start_times[course],
+                durations[course],
+                end_times[course],
+                ''
+            )
+            continue
+        for classroom in feasible_classrooms:
+            in_classroom[course, classroom] = model.NewBoolVar('')
+            model.Add(classroom_of[course] == classroom).OnlyEnforceIf(in_classroom[course, classroom])
+            model.Add(classroom_of[course] != classroom).OnlyEnforceIf(in_classroom[course, classroom].Not())
+            intervals[course, classroom] = model.NewOptionalIntervalVar(
+                start_times[course],
+                durations[course],
+                end_times[course],
+                in_classroom[course, classroom],
+                ''
+            )
+
+    # Each classroom can only handle one course at a time
     for classroom in range(num_classrooms):
-        for time_slot in range(1440):  # Time slots in a day (in minutes)
-            # Create a Boolean variable for whether the classroom is used at this time slot
-            is_classroom_used = model.NewBoolVar(f'is_classroom_{classroom}_used_at_{time_slot}_day_{day}')
-            
-            # Sum of courses assigned to this classroom at this time slot should be <= 1
-            model.Add(
-                sum(
-                    assignment[(day, course, professor, classroom)]
-                    for course in range(num_courses)
-                    for professor in range(num_professors)
-                ) <= 1
-            ).OnlyEnforceIf(is_classroom_used)
-
-
-# Enforce classroom equipment compatibility
-for day in range(num_days):
-    for course in range(num_courses):
-        for classroom in range(num_classrooms):
-            if course_equipment_requirements[course] != classroom_equipment_types[classroom]:
-                model.Add(
-                    sum(assignment[(day, course, professor, classroom)]
-                        for professor in range(num_professors)) == 0
-                )
-
-# Calculate end times based on start times, course durations, and professor efficiency
-# for day in range(num_days):
-#     for course in range(num_courses):
-#         for professor in range(num_professors):
-#             duration = int(course_durations[course] / professor_efficiency[professor])
-#             model.Add(end_times[(day, course)] == start_times[(day, course)] + duration).OnlyEnforceIf(
-#                 sum(assignment[(day, course, professor, classroom)]
-#                     for classroom in range(num_classrooms)) >= 1
-#             )
-for day in range(num_days):
+        model.AddNoOverlap(
+            [interval for interval in intervals[:, classroom] if interval is not None])
+
+    # Objective: Minimize the total time and distance
+    model.Minimize(cp_model.LinearExpr.Sum(durations.tolist()) + cp_model.LinearExpr.Sum(distances.tolist()))
+
+    # Warm start: hint a greedy schedule that puts each course in its closest compatible
+    # classroom with the fastest professor, stacking courses back to back per classroom
+    fastest_professor = max(range(num_professors), key=lambda professor: professor_efficiency[professor])
+    classroom_free_at = [0] * num_classrooms
     for course in range(num_courses):
-        for professor in range(num_professors):
-            for classroom in range(num_classrooms):
-                is_assigned = assignment[(day, course, professor, classroom)]
+        closest_classroom = min(feasible_classrooms_for_course[course],
+                                key=lambda classroom: classroom_distances[classroom])
+        duration = int(course_professor_durations[course, fastest_professor])
+        model.AddHint(professor_of[course], fastest_professor)
+        model.AddHint(durations[course], duration)
+        if len(feasible_classrooms_for_course[course]) > 1:
+            model.AddHint(classroom_of[course], closest_classroom)
+            model.AddHint(distances[course], classroom_distances[closest_classroom])
+            for classroom in feasible_classrooms_for_course[course]:
+                model.AddHint(in_classroom[course, classroom], classroom == closest_classroom)
+        model.AddHint(start_times[course], classroom_free_at[closest_classroom])
+        model.AddHint(end_times[course], classroom_free_at[closest_classroom] + duration)
+        classroom_free_at[closest_classroom] += duration
 
-                # Define the duration adjustment based on professor efficiency
-                duration = int(course_durations[course] / professor_efficiency[professor])
+    schedule_vars = [(professor_of[course], classroom_of[course], start_times[course], end_times[course])
+                     for course in range(num_courses)]
+    return model, schedule_vars
 
-                # Ensure `start_times` and `end_times` are linked to assignments
-                model.Add(end_times[(day, course)] == start_times[(day, course)] + duration).OnlyEnforceIf(is_assigned)
 
-                # Ensure courses not assigned to this professor/classroom are ignored
-                model.Add(start_times[(day, course)] == 0).OnlyEnforceIf(is_assigned.Not())
-                model.Add(end_times[(day, course)] == 0).OnlyEnforceIf(is_assigned.Not())
+def model_cache_key():
+    """Hash of everything the cached model depends on.
 
+    Covers the source of this script, which holds both the data and the
+    constraints, and the OR-Tools version that wrote the model.
+    """
+    with open(os.path.abspath(__file__), 'rb') as source_file:
+        key = hashlib.sha256(source_file.read())
+    key.update(ortools.__version__.encode())
+    return key.hexdigest()
+
+
+def load_cached_model(cache_key):
+    """Load the model cached by load_or_build_model(), or None on a cache miss.
+
+    A missing, stale, truncated or otherwise unreadable cache is a miss.
+    """
+    try:
+        with open(model_cache_path) as cache_file:
+            cache = json.load(cache_file)
+        if cache['key'] != cache_key:
+            return None
+        model = cp_model.CpModel()
+        proto = model.Proto()
+        if hasattr(proto, 'parse_text_format'):
+            # Newer OR-Tools wraps the proto in C++ and parses text format itself
+            if not proto.parse_text_format(cache['model']):
+                return None
+        else:
+            # Older OR-Tools exposes a cp_model_pb2 message; cloning rebuilds the
+            # Python-side variable list that GetIntVarFromProtoIndex reads from
+            text_format.Parse(cache['model'], proto)
+            model = model.Clone()
+        schedule_vars = [tuple(model.GetIntVarFromProtoIndex(entry['index']) if 'index' in entry
+                               else entry['value']
+                               for entry in course_entries)
+                         for course_entries in cache['schedule_vars']]
+    except (OSError, json.JSONDecodeError, KeyError, TypeError, ValueError, text_format.ParseError):
+        # A corrupt cache: the file is unreadable, has missing fields, holds an
+        # invalid model or refers to variable indices the model does not have
+        return None
+    if len(schedule_vars) != num_courses:
+        return None
+    return model, schedule_vars
+
+
+def load_or_build_model():
+    """Return the model and its schedule variables, as built by build_model().
+
+    The model proto is cached on disk together with the proto indices of the
+    schedule variables, so later runs of the same script and OR-Tools version
+    skip the Python build.
+    """
+    cache_key = model_cache_key()
+    cached = load_cached_model(cache_key)
+    if cached is not None:
+        return cached
+
+    model, schedule_vars = build_model()
+
+    # Write to a temporary file and move it into place, so an interrupted run
+    # never leaves a truncated cache behind
+    cache = {
+        'key': cache_key,
+        'model': str(model.Proto()),
+        'schedule_vars': [[{'value': entry} if isinstance(entry, int) else {'index': entry.Index()}
+                           for entry in course_vars]
+                          for course_vars in schedule_vars],
+    }
+    temp_path = f'{model_cache_path}.{os.getpid()}.tmp'
+    try:
+        with open(temp_path, 'w') as cache_file:
+            json.dump(cache, cache_file)
+        os.replace(temp_path, model_cache_path)
+    except OSError:
+        # The cache is only an optimization; a failed write just means the next run rebuilds
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+    return model, schedule_vars
+
+
+def solve_day(model, schedule_vars):
+    """Solve a single-day model from build_model().
+
+    Returns the solver status and a dict mapping each course to its (professor,
+    classroom, start time, end time), or None if no schedule was found.
+    """
+    # Solve the model
+    solver = cp_model.CpSolver()
+    solver.parameters.num_workers = os.cpu_count() or 1  # CP-SAT runs a parallel search portfolio
+    solver.parameters.log_search_progress = True
+    solver.parameters.max_time_in_seconds = 300.0
+    solver.parameters.relative_gap_limit = 0.01  # Stop once the incumbent is within 1% of the best bound
+    solver.parameters.linearization_level = 2  # Tighter LP relaxation for the mixed time/distance objective
+    solver.parameters.repair_hint = True
+    solver.parameters.cp_model_probing_level = 1  # The model is small and easy; full probing is not worth its cost
+    solver.parameters.optimize_with_core = True
+    solver.parameters.core_minimization_level = 1  # Higher levels can slow core-based search down by an order of magnitude
+    solution_printer = SolutionPrinter()
+    status = solver.Solve(model, solution_printer)
+
+    if status != cp_model.OPTIMAL and status != cp_model.FEASIBLE:
+        return status, None
+
+    # On a time or gap limit the status is FEASIBLE and the solver values are the
+    # best incumbent found before the search stopped
+    return status, {course: tuple(solver.Value(var) for var in course_vars)
+                    for course, course_vars in enumerate(schedule_vars)}
+
+
+def main():
+    # Every day has the same courses, professors and classrooms and no constraint links
+    # two days together, so each day is an independent subproblem. As they are also
+    # identical, one day is solved and its schedule repeated num_days times
+    status, day_schedule = solve_day(*load_or_build_model())
+
+    # Print solution
+    if day_schedule is not None:
+        schedule = {day: day_schedule for day in range(num_days)}
+        total_objective = sum(end_time - start_time + classroom_distances[classroom]
+                              for courses in schedule.values()
+                              for _, classroom, start_time, end_time in courses.values())
+        if status == cp_model.OPTIMAL:
+            print('Optimal schedule:')
+        else:
+            print('Best schedule found (not proven optimal):')
+        print(f'Total objective over {num_days} days: {total_objective}')
+        for day, courses in schedule.items():
+            for course, (professor, classroom, start_time, end_time) in courses.items():
+                print(f'Day {day}: Course {course} assigned to Professor {professor} in Classroom {classroom}')
+                print(f'Start Time: {start_time}')
+                print(f'End Time: {end_time}')
+    else:
+        print('No solution found.')
 
-# Objective: Minimize the total time and distance
-model.Minimize(
-    sum(end_times[(day, course)] - start_times[(day, course)] for day in range(num_days) for course in range(num_courses)) +
-    sum(classroom_distances[classroom] * assignment[(day, course, professor, classroom)]
-        for day in range(num_days)
-        for course in range(num_courses)
-        for professor in range(num_professors)
-        for classroom in range(num_classrooms))
-)
 
-# Solve the model
-solver = cp_model.CpSolver()
-status = solver.Solve(model)
-
-# Print solution
-if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
-    print('Optimal schedule:')
-    for day in range(num_days):
-        for course in range(num_courses):
-            for professor in range(num_professors):
-                for classroom in range(num_classrooms):
-                    if solver.Value(assignment[(day, course, professor, classroom)]):
-                        print(f'Day {day}: Course {course} assigned to Professor {professor} in Classroom {classroom}')
-                        print(f'Start Time: {solver.Value(start_times[(day, course)])}')
-                        print(f'End Time: {solver.Value(end_times[(day, course)])}')
-else:
-    print('No solution found.')
+if __name__ == "__main__":
+    main()